@@ -1,6 +1,6 @@
 import pandas as pd
 
-df = pd.read_excel("meter_data.xlsx")
+df = pd.read_excel("meter_data.xlsx", engine="calamine")
 df["Date"] = pd.to_datetime(df["Date"])
 
 df_grouped = df.groupby("Date").sum().reset_index()
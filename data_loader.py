@@ -1,17 +1,18 @@
-import pandas as pd
-import streamlit as st
+from utils import load_data
+
 
-@st.cache_data
 def load_and_prepare_data():
-    df = pd.read_excel("data/meter_data.xlsx")
+    # Shared cached loader (utils.load_data): one cache entry no matter
+    # which page triggers the load.
+    df = load_data()
 
-    # ---- STANDARDIZE ----
-    df["date"] = pd.to_datetime(df["date"])
+    # Views are enough here — callers only read these frames, so there
+    # is no need to deep-copy each filtered block.
 
     # WC-MI data
-    wc_df = df[df["Meter_Type"] == "WC-MI"].copy()
+    wc_df = df[df["Meter_Type"] == "WC-MI"]
 
     # DT data
-    dt_df = df[df["Meter_Type"] == "DT"].copy()
+    dt_df = df[df["Meter_Type"] == "DT"]
 
     return df, wc_df, dt_df
@@ -1,7 +1,11 @@
+import hashlib
+import hmac
+
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-from sqlalchemy import create_engine, text
+from sqlalchemy import column, create_engine, table, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import date
 
 # ===================== BASIC CONFIG ===================== #
@@ -9,8 +13,13 @@ st.set_page_config(page_title="Genus Meter Dashboard",
                    layout="wide",
                    initial_sidebar_state="expanded")
 
-# ---------- CSS ---------- #
-st.markdown("""
+# ---------- CSS + HEADER ---------- #
+# One static blob, one st.markdown element: a single node for the
+# front end to diff per rerun instead of three.
+# (Wrapping the emission in @st.cache_resource, as sometimes suggested,
+# would skip the st.markdown calls on reruns and the elements would be
+# reconciled away.)
+_CHROME_HTML = """
 <style>
     div.block-container {padding-top: 1.2rem;}
     thead tr th {
@@ -34,11 +43,18 @@ st.markdown("""
         font-weight: 700;
         color: #111827;
     }
+    .meter-tbl-wrap {overflow-x: auto;}
+    .meter-tbl {border-collapse: collapse; font-size: 0.85rem; white-space: nowrap;}
+    .meter-tbl th, .meter-tbl td {
+        border: 1px solid #e5e7eb;
+        padding: 2px 8px;
+        text-align: right;
+    }
+    .meter-tbl thead th {background-color: #003A8C; color: white;}
+    .meter-tbl tbody th {text-align: left;}
+    .meter-tbl tr.row-tm th, .meter-tbl tr.row-tm td {background: #CDE4FF; font-weight: bold;}
+    .meter-tbl tr.row-mp th, .meter-tbl tr.row-mp td {background: #D4F7D4; font-weight: bold;}
 </style>
-""", unsafe_allow_html=True)
-
-# ===================== HEADER ===================== #
-st.markdown("""
 <div style='text-align:center;margin-bottom:0.5rem;'>
     <span style='font-size:52px;font-weight:800;color:#003A8C;'>
         Genus Power Infrastructures Ltd.
@@ -47,13 +63,12 @@ st.markdown("""
                 background: linear-gradient(to right,#003A8C,#FFD700);
                 border-radius:4px;'></div>
 </div>
-""", unsafe_allow_html=True)
-
-st.markdown("""
 <h4 style='text-align:center;font-weight:700;margin-top:0.1rem;margin-bottom:0.8rem;'>
 📊 Meter Dashboard — WC/DT + Manpower
 </h4>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(_CHROME_HTML, unsafe_allow_html=True)
 
 # ===================== CONSTANTS ===================== #
 ALLOWED_PACKAGES = [
@@ -62,14 +77,39 @@ ALLOWED_PACKAGES = [
     "TN-32", "TN-33", "TN-34",
 ]
 
+# Above this many daily bars the chart is aggregated into weekly buckets
+# so render cost stays bounded no matter how much history accumulates.
+MAX_PLOT_POINTS = 120
+
 ADMIN_USER = st.secrets.get("ADMIN_USER", "admin")
 ADMIN_PASS = st.secrets.get("ADMIN_PASS", "12345")
+# Preferred: store only sha256(password).hexdigest() in secrets so the
+# plaintext never lives in config. ADMIN_PASS stays as a fallback for
+# existing deployments.
+ADMIN_PASS_SHA256 = st.secrets.get("ADMIN_PASS_SHA256", "")
+
+
+def check_admin(user, pwd):
+    # Constant-time comparisons throughout; only runs on an actual
+    # form submit, never on a passive rerun.
+    if not hmac.compare_digest(user.encode(), ADMIN_USER.encode()):
+        return False
+    if ADMIN_PASS_SHA256:
+        digest = hashlib.sha256(pwd.encode()).hexdigest()
+        return hmac.compare_digest(digest, ADMIN_PASS_SHA256.lower())
+    return hmac.compare_digest(pwd.encode(), ADMIN_PASS.encode())
 
 # ===================== DB CONNECTION ===================== #
 @st.cache_resource
 def get_engine():
     db_url = st.secrets["DB_URL"]
-    engine = create_engine(db_url, pool_pre_ping=True)
+    engine = create_engine(
+        db_url,
+        pool_size=5,
+        max_overflow=10,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
     return engine
 
 
@@ -94,13 +134,73 @@ def init_db():
     CREATE UNIQUE INDEX IF NOT EXISTS idx_meter_date_package
     ON meter_data(date, package);
     """
+    # Covering index: the dashboard rollup and the ordered full read can
+    # both be satisfied by index-only scans with no sort step.
+    ddl_index_cover = """
+    CREATE INDEX IF NOT EXISTS idx_meter_date_package_cover
+    ON meter_data(date, package)
+    INCLUDE (wc_mi, dt, ci, mi, in_house, supervisory);
+    """
+    # BRIN on date: for append-mostly time-series data the block-range
+    # summaries are a few pages total yet serve wide date-range scans as
+    # well as a B-tree, at near-zero insert maintenance cost. The unique
+    # (date, package) B-tree stays for upsert conflict detection.
+    ddl_index_brin = """
+    CREATE INDEX IF NOT EXISTS idx_meter_date_brin
+    ON meter_data USING BRIN (date) WITH (pages_per_range = 32);
+    """
+    # Daily rollup maintained inside Postgres: the dashboard read path
+    # becomes a range scan over O(days x packages) pre-summed rows.
+    # Writes are rare (admin panel only), so refreshing on write is cheap.
+    ddl_matview = """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS meter_daily AS
+    SELECT
+        date,
+        package,
+        SUM(wc_mi)       AS wc_mi,
+        SUM(dt)          AS dt,
+        SUM(ci)          AS ci,
+        SUM(mi)          AS mi,
+        SUM(in_house)    AS in_house,
+        SUM(supervisory) AS supervisory
+    FROM meter_data
+    GROUP BY date, package;
+    """
+    # Unique index is required for REFRESH ... CONCURRENTLY.
+    ddl_matview_index = """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_meter_daily_date_package
+    ON meter_daily(date, package);
+    """
     with engine.begin() as conn:
         conn.execute(text(ddl_table))
         conn.execute(text(ddl_index))
+        conn.execute(text(ddl_index_cover))
+        conn.execute(text(ddl_index_brin))
+        conn.execute(text(ddl_matview))
+        conn.execute(text(ddl_matview_index))
     return True
 
 
-@st.cache_data
+def refresh_daily_view():
+    """Re-materialise meter_daily after a write.
+
+    CONCURRENTLY keeps readers unblocked but refuses to run inside a
+    transaction block, hence the autocommit connection.
+    """
+    engine = get_engine()
+    with engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as conn:
+        conn.execute(text(
+            "REFRESH MATERIALIZED VIEW CONCURRENTLY meter_daily;"
+        ))
+
+
+# cache_resource hands every session the same frame by reference —
+# nothing downstream mutates it, so there is no point paying
+# cache_data's pickle/deep-copy on each hit. The TTL lets admin writes
+# surface without a manual clear.
+@st.cache_resource(ttl=300)
 def load_data():
     """Read all data from DB with computed columns."""
     engine = get_engine()
@@ -117,51 +217,386 @@ def load_data():
     FROM meter_data
     ORDER BY date ASC;
     """
+    # Server-side cursor: rows stream in chunks instead of the driver
+    # materialising the whole result set before pandas sees it.
+    # Arrow-backed columns arrive typed (no object->numeric coercion
+    # pass) and st.dataframe serialises them to the front end without a
+    # pandas->Arrow conversion.
+    with engine.connect().execution_options(stream_results=True) as conn:
+        frames = list(pd.read_sql_query(
+            text(query), conn, chunksize=50_000, dtype_backend="pyarrow"
+        ))
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if df.empty:
+        return df
+
+    # Keep datetime64[ns]: Python date objects would force object-dtype
+    # comparisons in every downstream filter. Format only at display time.
+    # Skip the parse entirely when the driver already returned datetimes;
+    # cache=True memoises repeated values otherwise.
+    if not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        df["date"] = pd.to_datetime(df["date"], cache=True)
+
+    # Category codes make the pivot groupby key integer-based and shrink
+    # the column to one int8 per row plus the nine package strings.
+    df["package"] = df["package"].astype("category")
+
+    num_cols = ["wc_mi", "dt", "ci", "mi", "in_house", "supervisory"]
+    # The columns are NOT NULL ints in the schema, so a narrowing cast is
+    # all that is left; int32 halves the bytes moved downstream and the
+    # arrow flavour keeps the frame zero-copy for st.dataframe.
+    df[num_cols] = df[num_cols].astype("int32[pyarrow]")
+
+    # Single contiguous reduction instead of a chain of Series adds that
+    # would materialise an intermediate per "+".
+    df["Total_Manpower"] = (
+        df[["ci", "mi", "in_house", "supervisory"]]
+        .to_numpy().sum(axis=1).astype("int32")
+    )
+    df["Total_WC_DT"] = (
+        df[["wc_mi", "dt"]].to_numpy().sum(axis=1).astype("int32")
+    )
+    return df
+
+
+@st.cache_resource(ttl=300)
+def load_daily_pivot():
+    """Daily (date x package) aggregate, built once per data load.
+
+    The rollup happens inside Postgres, so only O(days x packages)
+    aggregated rows cross the wire; dashboard interactions then slice
+    this small dense frame instead of touching raw rows at all.
+    """
+    engine = get_engine()
+    # meter_daily is the materialized rollup kept fresh by the write
+    # path, so the read is a plain index-ordered scan — no GROUP BY.
+    query = """
+    SELECT
+        date,
+        package,
+        wc_mi,
+        dt,
+        ci,
+        mi,
+        in_house,
+        supervisory
+    FROM meter_daily
+    ORDER BY date ASC;
+    """
     df = pd.read_sql(query, engine)
     if df.empty:
         return df
 
-    df["date"] = pd.to_datetime(df["date"]).dt.date
+    if not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        df["date"] = pd.to_datetime(df["date"], cache=True)
 
     num_cols = ["wc_mi", "dt", "ci", "mi", "in_house", "supervisory"]
-    for c in num_cols:
-        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype(int)
+    df[num_cols] = df[num_cols].astype("int32")
+    df["Total_Manpower"] = (
+        df[["ci", "mi", "in_house", "supervisory"]]
+        .to_numpy().sum(axis=1).astype("int32")
+    )
+    df["Total_WC_DT"] = (
+        df[["wc_mi", "dt"]].to_numpy().sum(axis=1).astype("int32")
+    )
 
-    df["Total_Manpower"] = df["ci"] + df["mi"] + df["in_house"] + df["supervisory"]
-    df["Total_WC_DT"] = df["wc_mi"] + df["dt"]
-    return df
+    cols = num_cols + ["Total_Manpower", "Total_WC_DT"]
+    # (date, package) is unique after the SQL GROUP BY, so this is a
+    # plain reshape, not another aggregation.
+    daily = df.set_index(["date", "package"])[cols].unstack(
+        "package", fill_value=0
+    )
+    return daily
+
+
+def combine_packages(sub):
+    """Sum a (value column x package) pivot slice across packages.
+
+    unstack() leaves the columns grouped contiguously by value column,
+    so one np.add.reduceat along axis=1 replaces the transpose +
+    groupby(level=0) round trip — a single C loop, no hash table.
+    """
+    lev0 = sub.columns.get_level_values(0)
+    starts = np.flatnonzero(np.r_[True, lev0[1:] != lev0[:-1]])
+    out = np.add.reduceat(sub.to_numpy(), starts, axis=1)
+    return pd.DataFrame(out, index=sub.index, columns=lev0[starts])
+
+
+@st.cache_data(ttl=300, max_entries=64)
+def aggregate_view(start_date, end_date, package=None):
+    """Zero-filled daily aggregate for one filter combination.
+
+    Cached on (start, end, package) so toggling back to a recently used
+    filter state skips the slice/reduce/reindex entirely. Same TTL as
+    the loaders: entries must not outlive them, or writes landing in
+    another process would never surface here.
+    """
+    daily = load_daily_pivot()
+
+    # Two binary searches on the sorted int64 datetime index — no boolean
+    # mask allocation and no label-resolution machinery.
+    lo, hi = daily.index.values.searchsorted([
+        np.datetime64(start_date),
+        np.datetime64(end_date) + np.timedelta64(1, "D"),
+    ])
+    sub = daily.iloc[lo:hi]
+
+    if package is None:
+        grp = combine_packages(sub)
+    elif package in sub.columns.get_level_values("package"):
+        grp = sub.xs(package, axis=1, level="package")
+    else:
+        grp = combine_packages(sub.iloc[0:0])
+
+    # Pad onto the exact window the user picked so missing days render
+    # as zero bars — sized by the selection, never a hardcoded range.
+    # When every day already has a row (the common case) the lengths
+    # match and the reindex hash-lookup is skipped outright.
+    idx = pd.date_range(start_date, end_date, freq="D")
+    if len(grp) != len(idx):
+        grp = grp.reindex(idx, fill_value=0)
+    return grp.rename_axis("date").reset_index()
 
 
 def clear_cache():
     load_data.clear()
+    load_daily_pivot.clear()
+    aggregate_view.clear()
+
+
+VALUE_COLS = ("wc_mi", "dt", "ci", "mi", "in_house", "supervisory")
+
+# A compiled insert() construct, not text() SQL: SQLAlchemy's
+# insertmanyvalues batching only applies to compiled inserts — an
+# executemany over a text() statement still issues one round trip per
+# row on psycopg2.
+_METER_TABLE = table(
+    "meter_data",
+    column("date"),
+    column("package"),
+    *(column(c) for c in VALUE_COLS),
+)
+_INSERT = pg_insert(_METER_TABLE)
+UPSERT_STMT = _INSERT.on_conflict_do_update(
+    index_elements=["date", "package"],
+    set_={c: _INSERT.excluded[c] for c in VALUE_COLS},
+)
+
+
+def filter_unchanged(rows):
+    """Drop rows whose (date, package) already hold identical values.
+
+    Re-uploading a mostly unchanged CSV then costs one SELECT over the
+    affected date span instead of rewriting every row — and when nothing
+    actually changed, the matview refresh and cache invalidation are
+    skipped entirely, keeping every session's warm caches intact.
+    """
+    engine = get_engine()
+    dates = sorted({r["date"] for r in rows})
+    query = text("""
+        SELECT date, package, wc_mi, dt, ci, mi, in_house, supervisory
+        FROM meter_data
+        WHERE date BETWEEN :lo AND :hi;
+    """)
+    with engine.connect() as conn:
+        existing = {
+            (rec.date, rec.package): (
+                rec.wc_mi, rec.dt, rec.ci,
+                rec.mi, rec.in_house, rec.supervisory,
+            )
+            for rec in conn.execute(query, {"lo": dates[0], "hi": dates[-1]})
+        }
+    return [
+        r for r in rows
+        if existing.get((r["date"], r["package"]))
+        != tuple(int(r[c]) for c in VALUE_COLS)
+    ]
 
 
-def upsert_row(row):
-    """Insert or update a single Date+Package row."""
+def bulk_upsert(rows):
+    """Upsert many Date+Package rows in one transaction.
+
+    SQLAlchemy turns the parameter list into a batched executemany
+    (insertmanyvalues on Postgres), so a whole CSV costs one round trip
+    and one cache invalidation instead of one per row. Returns the
+    number of rows actually written after dropping unchanged ones.
+    """
+    if not rows:
+        return 0
+    rows = filter_unchanged(rows)
+    if not rows:
+        return 0
     engine = get_engine()
-    stmt = text("""
-        INSERT INTO meter_data
-            (date, package, wc_mi, dt, ci, mi, in_house, supervisory)
-        VALUES
-            (:date, :package, :wc_mi, :dt, :ci, :mi, :in_house, :supervisory)
-        ON CONFLICT (date, package)
-        DO UPDATE SET
-            wc_mi      = EXCLUDED.wc_mi,
-            dt         = EXCLUDED.dt,
-            ci         = EXCLUDED.ci,
-            mi         = EXCLUDED.mi,
-            in_house   = EXCLUDED.in_house,
-            supervisory= EXCLUDED.supervisory;
-    """)
     with engine.begin() as conn:
-        conn.execute(stmt, row)
+        conn.execute(UPSERT_STMT, rows)
+    refresh_daily_view()
     clear_cache()
+    return len(rows)
+
+
+def upsert_row(row):
+    """Insert or update a single Date+Package row."""
+    bulk_upsert([row])
 
 
 def kfmt(v: float) -> str:
     return f"{v/1000:.1f}k" if v >= 1000 else str(int(v))
 
 
+def render_table_html(table: pd.DataFrame) -> str:
+    """Summary table as plain HTML with two class-tagged rows.
+
+    The highlight styling lives once in the static CSS block, so the
+    payload carries no per-cell style attributes."""
+    row_cls = {
+        "🔷 Total Meters (WC+DT)": " class='row-tm'",
+        "🟢 Total Manpower": " class='row-mp'",
+    }
+    head = "".join(f"<th>{c}</th>" for c in table.columns)
+    rows = []
+    for name, vals in table.iterrows():
+        cells = "".join(f"<td>{v}</td>" for v in vals.to_numpy())
+        rows.append(f"<tr{row_cls.get(name, '')}><th>{name}</th>{cells}</tr>")
+    return (
+        "<div class='meter-tbl-wrap'><table class='meter-tbl'>"
+        f"<thead><tr><th></th>{head}</tr></thead>"
+        f"<tbody>{''.join(rows)}</tbody></table></div>"
+    )
+
+
+@st.cache_data(max_entries=32)
+def format_ticks(start, end):
+    """Tick positions and %d-%b labels for a window, cached per range."""
+    full = pd.date_range(start, end, freq="D")
+    return full, full.strftime("%d-%b")
+
+
+def vkfmt(arr):
+    """Vectorised kfmt: two C-level string builds instead of one Python
+    call (and one f-string) per bar."""
+    arr = np.asarray(arr, dtype=np.float64)
+    s_big = np.char.add(np.char.mod("%.1f", arr / 1000), "k")
+    s_small = np.char.mod("%d", arr)
+    return np.where(arr >= 1000, s_big, s_small)
+
+
+def build_base_figure():
+    """Static figure skeleton, built once per session.
+
+    Everything that does not depend on the current filters (trace styling,
+    hovertemplate, layout) lives here; graph_and_table only assigns the
+    data arrays and tick labels on each rerun.
+    """
+    # Imported here so reruns that never render a chart (admin panel,
+    # empty data) skip the plotly import entirely; sys.modules makes
+    # repeat calls free.
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    # orjson serialises the ndarray trace data through the buffer
+    # protocol instead of walking values through Python objects.
+    try:
+        pio.json.config.default_engine = "orjson"
+    except ValueError:
+        # orjson not installed; plotly keeps its stdlib encoder.
+        pass
+
+    # The hovered bar's own value comes from %{y}, so customdata only
+    # carries the six columns that are not already on the trace.
+    hovertemplate = (
+        "Date: %{x}<br><br>"
+        "Total Manpower: %{customdata[0]}<br>"
+        "CI: %{customdata[1]}<br>"
+        "MI: %{customdata[2]}<br>"
+        "IN-HOUSE: %{customdata[3]}<br>"
+        "Supervisory: %{customdata[4]}<br><br>"
+        "Total Meters: %{customdata[5]}<br>"
+    )
+
+    # Plain dict specs assembled once and handed to the Figure
+    # constructor in one shot — no per-add_trace schema walk.
+    traces = [
+        # WC-MI bars — no hover payload of their own; the DT trace on
+        # top of the stack carries the full breakdown, so customdata is
+        # serialised once per figure instead of twice.
+        {
+            "type": "bar",
+            "name": "WC-MI",
+            "marker": {"line": {"width": 0}},
+            "hoverinfo": "skip",
+        },
+        # DT stacked bars. The total-meters labels ride on this trace as
+        # bar text (one trace fewer to lay out and hit-test than the old
+        # dedicated text scatter).
+        {
+            "type": "bar",
+            "name": "DT",
+            "marker": {"line": {"width": 0}},
+            "textposition": "outside",
+            "textfont": {"size": 10, "color": "#1A1A1A", "family": "Arial"},
+            "cliponaxis": False,
+            "hovertemplate": (
+                hovertemplate
+                + "WC-MI: %{customdata[6]}<br>"
+                + "DT: %{y:.0f}<br><extra></extra>"
+            ),
+        },
+        # Manpower line — WebGL so point count scales with pixels, not
+        # DOM nodes. The bold value labels ride on a separate SVG text
+        # trace because scattergl cannot render text.
+        {
+            "type": "scattergl",
+            "name": "Total Manpower",
+            "mode": "lines+markers",
+            "line": {"width": 3},
+            "marker": {"size": 9, "color": "#C61919"},
+            "yaxis": "y2",
+            "hoverinfo": "skip",
+        },
+        {
+            "type": "scatter",
+            "mode": "text",
+            "textposition": "top center",
+            "textfont": {"color": "#003A8C", "size": 12, "family": "Arial"},
+            "yaxis": "y2",
+            "hoverinfo": "skip",
+            "showlegend": False,
+        },
+    ]
+
+    layout = {
+        "height": 580,
+        # Palette in one place: traces pick colours up by position
+        # (WC-MI, DT, manpower line), so theming is a single edit and no
+        # trace carries its own colour string. The red line markers stay
+        # per-trace — colorway is one colour per trace, not per part.
+        "colorway": ["#FF7B7B", "#FFD700", "#003A8C"],
+        # Stacking is done explicitly via the DT trace's base= array, so
+        # Plotly skips its own stacking pass; overlay just keeps the two
+        # bar traces on the same x slots.
+        "barmode": "overlay",
+        # Unified hover: the breakdown lives on the DT trace only, so
+        # with closest-mode the WC-MI segment would be a dead zone —
+        # x unified shows the one tooltip wherever the bar is hovered.
+        "hovermode": "x unified",
+        # Stable uirevision keeps zoom/legend state across reruns instead
+        # of forcing a full client-side redraw.
+        "uirevision": "static",
+        "xaxis": {"tickangle": 45},
+        "yaxis": {"title": "Meters"},
+        "yaxis2": {"title": "Manpower", "overlaying": "y", "side": "right"},
+        "legend": {
+            "orientation": "h",
+            "yanchor": "bottom",
+            "y": 1.02,
+            "xanchor": "center",
+            "x": 0.5,
+        },
+    }
+
+    return go.Figure({"data": traces, "layout": layout})
+
+
 # Ensure table exists
 init_db()
 
@@ -171,25 +606,25 @@ mode = st.sidebar.radio("🔀 Navigate", ["Dashboard", "Admin Panel"])
 # ====================================================== #
 #                       DASHBOARD                        #
 # ====================================================== #
-def graph_and_table(df_view: pd.DataFrame):
-    if df_view.empty:
+def graph_and_table(df_view: pd.DataFrame, granularity: str = "Auto"):
+    if df_view.empty or df_view[["wc_mi", "dt", "Total_Manpower"]].to_numpy().sum() == 0:
         st.info("No data available for the selected filters.")
         return
 
     # ---------- KPI Calculations ---------- #
-    total_meters = int(df_view["Total_WC_DT"].sum())
+    # Raw ndarray reductions: sum + argmax run as C loops and positional
+    # indexing avoids the idxmax/.loc label round trips.
+    tot = df_view["Total_WC_DT"].to_numpy()
+    man = df_view["Total_Manpower"].to_numpy()
+    dates = df_view["date"]
 
-    peak_m_idx = df_view["Total_WC_DT"].idxmax()
-    peak_install_label = (
-        f"{int(df_view.loc[peak_m_idx, 'Total_WC_DT'])} on "
-        f"{df_view.loc[peak_m_idx, 'date'].strftime('%d-%b')}"
-    )
+    total_meters = int(tot.sum())
 
-    peak_mp_idx = df_view["Total_Manpower"].idxmax()
-    peak_mp_label = (
-        f"{int(df_view.loc[peak_mp_idx, 'Total_Manpower'])} on "
-        f"{df_view.loc[peak_mp_idx, 'date'].strftime('%d-%b')}"
-    )
+    i_m = int(tot.argmax())
+    peak_install_label = f"{int(tot[i_m])} on {dates.iat[i_m]:%d-%b}"
+
+    i_mp = int(man.argmax())
+    peak_mp_label = f"{int(man[i_mp])} on {dates.iat[i_mp]:%d-%b}"
 
     # ---------- KPI cards ---------- #
     c1, c2, c3 = st.columns(3)
@@ -215,106 +650,106 @@ def graph_and_table(df_view: pd.DataFrame):
             f"</div>", unsafe_allow_html=True
         )
 
-    # ---------- Graph ---------- #
-    full_dates = pd.date_range(df_view["date"].min(), df_view["date"].max()).date
+    # ---------- Downsample wide ranges ---------- #
+    # Counts are additive, so bucketed sums stay exact; KPIs above are
+    # computed on the daily frame before bucketing. "Auto" keeps the
+    # old heuristic: daily bars until the range outgrows the plot.
+    if granularity == "Auto":
+        rule = "W" if len(df_view) > MAX_PLOT_POINTS else None
+    else:
+        rule = {"Daily": None, "Weekly": "W", "Monthly": "MS"}[granularity]
+    downsampled = rule is not None
+    if downsampled:
+        df_view = (
+            df_view.set_index("date")
+            .resample(rule)
+            .sum()
+            .reset_index()
+        )
 
-    hovertemplate = (
-        "Date: %{x}<br><br>"
-        "Total Manpower: %{customdata[0]}<br>"
-        "CI: %{customdata[1]}<br>"
-        "MI: %{customdata[2]}<br>"
-        "IN-HOUSE: %{customdata[3]}<br>"
-        "Supervisory: %{customdata[4]}<br><br>"
-        "Total Meters: %{customdata[5]}<br>"
-        "WC-MI: %{customdata[6]}<br>"
-        "DT: %{customdata[7]}<br>"
-        "<extra></extra>"
+    # ---------- Graph ---------- #
+    # Stringify each label set once via the vectorised strftime — cached
+    # per window for the daily case, so repeat interactions on the same
+    # range reuse the arrays. The table reuses the row labels below.
+    if downsampled:
+        full_dates = pd.DatetimeIndex(df_view["date"])
+        tick_labels = full_dates.strftime("%d-%b")
+    else:
+        full_dates, tick_labels = format_ticks(
+            df_view["date"].iloc[0], df_view["date"].iloc[-1]
+        )
+    row_labels = (
+        tick_labels if len(full_dates) == len(df_view)
+        else pd.DatetimeIndex(df_view["date"]).strftime("%d-%b")
     )
 
-    fig = go.Figure()
-
-    # WC-MI bars
-    fig.add_trace(go.Bar(
-        x=df_view["date"],
-        y=df_view["wc_mi"],
-        name="WC-MI",
-        marker_color="#FF7B7B",
-        customdata=df_view[[
-            "Total_Manpower", "ci", "mi",
-            "in_house", "supervisory",
-            "Total_WC_DT", "wc_mi", "dt"
-        ]],
-        hovertemplate=hovertemplate
-    ))
-
-    # DT stacked bars
-    fig.add_trace(go.Bar(
-        x=df_view["date"],
-        y=df_view["dt"],
-        name="DT",
-        marker_color="#FFD700",
-        customdata=df_view[[
+    # One contiguous int32 block, built once and shared by both bar
+    # traces: Plotly serialises an ndarray without per-cell boxing, and
+    # int32 is half the width of float64 while keeping counts exact in
+    # the hover.
+    customdata = np.ascontiguousarray(
+        df_view[[
             "Total_Manpower", "ci", "mi",
             "in_house", "supervisory",
-            "Total_WC_DT", "wc_mi", "dt"
-        ]],
-        hovertemplate=hovertemplate
-    ))
-
-    # Manpower line
-    fig.add_trace(go.Scatter(
-    x=df_view["date"],
-    y=df_view["Total_Manpower"],
-    name="Total Manpower",
-    mode="lines+markers+text",
-    text=[f"<b>{int(v)}</b>" for v in df_view["Total_Manpower"]],
-    textposition="top center",
-    textfont=dict(color="#003A8C", size=12, family="Arial"),  # 🔹 DIGIT COLOR ADDED
-    line=dict(color="#003A8C", width=3),
-    marker=dict(size=9, color="#C61919"),
-    yaxis="y2",
-    hoverinfo="skip"
-))
-
-
-    # ===== Improved: Total meters (k) labels (bottom clean style) ===== #
-    fig.add_trace(go.Scatter(
-    x=df_view["date"],
-    y=[-50] * len(df_view),  # Small offset to prevent overlap with bars
-    mode="text",
-    text=[f"<b>{kfmt(v)}</b>" for v in df_view["Total_WC_DT"]],
-    textposition="bottom center",
-    textfont=dict(
-        size=10,          # Slightly reduced size
-        color="#1A1A1A",  # Darker for contrast
-        family="Arial",
-    ),
-    hoverinfo="skip",
-    showlegend=False
-))
-
-
-    # ============================================================ #
-
-    fig.update_layout(
-        height=580,
-        barmode="stack",
-        hovermode="closest",
-        xaxis=dict(
+            "Total_WC_DT", "wc_mi"
+        ]].to_numpy(dtype=np.int32)
+    )
+
+    # Reuse the figure skeleton across reruns: only the trace arrays and
+    # tick labels change with the filters, so there is no need to rebuild
+    # (and re-validate) four traces plus the layout on every interaction.
+    if "base_fig" not in st.session_state:
+        st.session_state["base_fig"] = build_base_figure()
+    fig = st.session_state["base_fig"]
+
+    # Hand Plotly plain ndarrays: the encoder fast-paths them instead of
+    # iterating a Series element by element.
+    x = df_view["date"].to_numpy()
+    man_arr = df_view["Total_Manpower"].to_numpy()
+    bar_wc, bar_dt, line_mp, txt_mp = fig.data
+
+    wc_arr = df_view["wc_mi"].to_numpy()
+    bar_wc.x = x
+    bar_wc.y = wc_arr
+
+    # DT sits on top of WC-MI via base= — pre-stacked client side, so
+    # Plotly's own stacking pass never runs.
+    bar_dt.x = x
+    bar_dt.y = df_view["dt"].to_numpy()
+    bar_dt.base = wc_arr
+    bar_dt.customdata = customdata
+    bar_dt.text = np.char.add(
+        np.char.add("<b>", vkfmt(df_view["Total_WC_DT"])), "</b>"
+    )
+
+    line_mp.x = x
+    line_mp.y = man_arr
+
+    txt_mp.x = x
+    txt_mp.y = man_arr
+    txt_mp.text = np.char.add(
+        np.char.add("<b>", np.char.mod("%d", man_arr)), "</b>"
+    )
+
+    # One labelled tick per bar is unreadable (and costly) past ~60
+    # bars; beyond that let Plotly auto-thin the axis. Both branches
+    # assign explicitly because the figure object persists across reruns.
+    if len(full_dates) > 60:
+        fig.update_xaxes(
+            tickvals=None,
+            ticktext=None,
+            tickformat="%d-%b",
+            nticks=30,
+            tickangle=45
+        )
+    else:
+        fig.update_xaxes(
             tickvals=full_dates,
-            ticktext=[d.strftime("%d-%b") for d in full_dates],
+            ticktext=tick_labels,
+            tickformat=None,
+            nticks=None,
             tickangle=45
-        ),
-        yaxis=dict(title="Meters"),
-        yaxis2=dict(title="Manpower", overlaying="y", side="right"),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="center",
-            x=0.5
         )
-    )
 
     st.plotly_chart(fig, use_container_width=True)
 
@@ -324,8 +759,7 @@ def graph_and_table(df_view: pd.DataFrame):
         "Total_Manpower", "ci", "mi", "in_house", "supervisory"
     ]]
 
-    # FIX: make index datetime before strftime (prevents AttributeError)
-    table.index = pd.to_datetime(table.index).strftime("%d-%b")
+    table.index = row_labels
 
     table = table.T
 
@@ -336,29 +770,17 @@ def graph_and_table(df_view: pd.DataFrame):
 
     table = table.astype(int)
 
-    def highlight_rows(row):
-        if row.name == "🔷 Total Meters (WC+DT)":
-            return ["background-color:#CDE4FF;font-weight:bold"] * len(row)
-        if row.name == "🟢 Total Manpower":
-            return ["background-color:#D4F7D4;font-weight:bold"] * len(row)
-        return [""] * len(row)
-
     st.subheader("📋 Date-wise Summary Table")
-    st.dataframe(
-        table.style.apply(highlight_rows, axis=1),
-        use_container_width=True
-    )
+    st.markdown(render_table_html(table), unsafe_allow_html=True)
 
 
-def show_dashboard():
-    df = load_data()
-    if df.empty:
-        st.info("No data in database yet. Add data from the **Admin Panel**.")
-        return
-
+@st.fragment
+def dashboard_filters_and_chart(min_d, max_d):
+    """Filters + chart + table as one fragment: changing a filter reruns
+    only this block, not the whole script."""
     st.markdown("### 🔍 Filters")
 
-    col1, col2, col3 = st.columns([2, 1, 1])
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
 
     with col1:
         view = st.radio(
@@ -367,9 +789,6 @@ def show_dashboard():
             horizontal=True
         )
 
-    min_d = df["date"].min()
-    max_d = df["date"].max()
-
     with col2:
         start_date = st.date_input(
             "Start Date",
@@ -384,40 +803,49 @@ def show_dashboard():
             min_value=min_d,
             max_value=max_d
         )
+    with col4:
+        granularity = st.selectbox(
+            "Granularity",
+            ["Auto", "Daily", "Weekly", "Monthly"]
+        )
 
     if start_date > end_date:
         st.error("Start Date cannot be after End Date.")
         return
 
-    mask = (df["date"] >= start_date) & (df["date"] <= end_date)
-    df_range = df[mask]
-
     if view == "Combined View":
-        grp = df_range.groupby("date")[[
-            "wc_mi", "dt", "ci", "mi", "in_house",
-            "supervisory", "Total_Manpower", "Total_WC_DT"
-        ]].sum().reset_index()
-        graph_and_table(grp)
+        grp = aggregate_view(start_date, end_date)
     else:
         pkg = st.selectbox("Select Package", ALLOWED_PACKAGES)
-        df_pkg = df_range[df_range["package"] == pkg]
-        grp = df_pkg.groupby("date")[[
-            "wc_mi", "dt", "ci", "mi", "in_house",
-            "supervisory", "Total_Manpower", "Total_WC_DT"
-        ]].sum().reset_index()
-        graph_and_table(grp)
+        grp = aggregate_view(start_date, end_date, pkg)
+    graph_and_table(grp, granularity)
+
+
+def show_dashboard():
+    daily = load_daily_pivot()
+    if daily.empty:
+        st.info("No data in database yet. Add data from the **Admin Panel**.")
+        return
+
+    dashboard_filters_and_chart(
+        daily.index.min().date(),
+        daily.index.max().date()
+    )
 
 
 # ====================================================== #
 #                        ADMIN PANEL                     #
 # ====================================================== #
 def parse_date_col(series: pd.Series) -> pd.Series:
-    """Parse dates from CSV in flexible formats."""
-    parsed = pd.to_datetime(series, errors="coerce", dayfirst=True)
-    mask = parsed.isna()
-    if mask.any():
-        parsed2 = pd.to_datetime(series[mask], errors="coerce", yearfirst=True)
-        parsed.loc[mask] = parsed2
+    """Parse dates from CSV in flexible formats.
+
+    format="mixed" infers the format per element inside one C-level
+    pass, replacing the old dayfirst parse + yearfirst retry on the NaT
+    subset (and the aligned .loc writeback that came with it).
+    """
+    parsed = pd.to_datetime(
+        series, errors="coerce", format="mixed", dayfirst=True
+    )
     return parsed.dt.date
 
 
@@ -459,25 +887,19 @@ def handle_csv_upload(uploaded):
     for c in num_cols:
         df_csv[c] = pd.to_numeric(df_csv[c], errors="coerce").fillna(0).astype(int)
 
-    count = 0
-    for _, r in df_csv.iterrows():
-        row = dict(
-            date=r["date"],
-            package=r["package"],
-            wc_mi=int(r["wc_mi"]),
-            dt=int(r["dt"]),
-            ci=int(r["ci"]),
-            mi=int(r["mi"]),
-            in_house=int(r["in_house"]),
-            supervisory=int(r["supervisory"])
-        )
-        upsert_row(row)
-        count += 1
+    rows = df_csv[required].to_dict("records")
+    written = bulk_upsert(rows)
 
-    st.success(f"CSV processed successfully. {count} rows inserted/updated.")
+    st.success(
+        f"CSV processed successfully. {written} of {len(rows)} rows "
+        "inserted/updated (unchanged rows skipped)."
+    )
 
 
+@st.fragment
 def show_admin():
+    # Fragment-scoped like the dashboard: typing in the login form or
+    # saving a row reruns only the admin block.
     st.markdown("## 🔐 Admin Panel")
 
     if "is_admin" not in st.session_state:
@@ -489,7 +911,7 @@ def show_admin():
             p = st.text_input("Password", type="password")
             submitted = st.form_submit_button("Login")
         if submitted:
-            if u == ADMIN_USER and p == ADMIN_PASS:
+            if check_admin(u, p):
                 st.session_state.is_admin = True
                 st.success("Logged in ✅")
             else:
@@ -1,11 +1,39 @@
+import os
+
 import pandas as pd
+import streamlit as st
 
-@st.cache_data
-def load_data():
-    df = pd.read_excel("data/meter_data.xlsx")
-    df["date"] = pd.to_datetime(df["date"])
+DATA_PATH = "data/meter_data.xlsx"
+
+# Only the columns the pages actually consume — the parser skips the
+# rest of the sheet entirely.
+USECOLS = ["date", "Meter_Type", "Installed", "Pending", "Planned"]
+
+
+@st.cache_data(show_spinner=False)
+def _load(path, mtime):
+    # mtime keys the cache so a refreshed workbook is re-read. On disk
+    # we keep a Parquet sidecar: the XLSX is only parsed when it is newer
+    # than the sidecar, every other cold start reads columnar Arrow with
+    # the dtypes (including the parsed dates) already in place.
+    pq = os.path.splitext(path)[0] + ".parquet"
+    if os.path.exists(pq) and os.path.getmtime(pq) >= mtime:
+        return pd.read_parquet(pq, engine="pyarrow")
+
+    df = pd.read_excel(path, engine="calamine", usecols=USECOLS)
+    # This branch only runs when the column came through as text, and
+    # workbook text dates show up in whatever format they were typed —
+    # infer per element rather than demanding one pattern.
+    if not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        df["date"] = pd.to_datetime(df["date"], format="mixed", cache=True)
+    df.to_parquet(pq, engine="pyarrow")
     return df
 
+
+def load_data():
+    return _load(DATA_PATH, os.path.getmtime(DATA_PATH))
+
+
 def filter_data(df, meter_type):
     if meter_type == "WC":
         return df[df["Meter_Type"] == "WC"]